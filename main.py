@@ -3,17 +3,23 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.progressbar import ProgressBar
-from kivy.clock import Clock
+from kivy.clock import Clock, mainthread
+from kivy.animation import Animation
 from kivy.logger import Logger
 from kivy.utils import platform
-import threading
-import time
 import re
+from functools import partial
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # Only import Android-specific modules on Android platform
 if platform == 'android':
     from jnius import autoclass, PythonJavaClass, java_method
     from android.permissions import request_permissions, Permission
+    from android.runnable import run_on_ui_thread
     
     # Android Components
     SpeechRecognizer = autoclass('android.speech.SpeechRecognizer')
@@ -25,10 +31,15 @@ if platform == 'android':
 else:
     # Mock classes for desktop testing
     class MockJavaClass:
+        # One shared no-op returned for every attribute lookup
+        _noop = staticmethod(lambda *args, **kwargs: None)
+        
         def __init__(self, *args, **kwargs): pass
-        def __getattr__(self, name): return lambda *args, **kwargs: None
+        def __getattr__(self, name): return MockJavaClass._noop
     
     SpeechRecognizer = RecognizerIntent = Intent = PythonActivity = Context = Bundle = MockJavaClass
+    
+    def run_on_ui_thread(func): return func
 
 # Enhanced color mappings with more colors
 COLOR_MAP = {
@@ -42,28 +53,94 @@ COLOR_MAP = {
     'pink': [38000, 9000, 4500, 1687, 562, 562, 1687]
 }
 
-# Command patterns for better recognition
+# Color list for help and error text, joined once
+_COLOR_LIST_STR = ', '.join(COLOR_MAP)
+
+# Power codes
+POWER_CODES = {
+    'on': [38000, 9000, 4500, 562, 562, 562, 562],
+    'off': [38000, 9000, 4500, 562, 1687, 1687, 562]
+}
+
+# Split every code into (frequency, signal pattern) once so transmits don't slice
+_IR_BURSTS = {name: (code[0], tuple(code[1:])) for name, code in {**COLOR_MAP, **POWER_CODES}.items()}
+
+# Command patterns for better recognition. On/off entries are literal
+# phrases; color entries are regex prefixes for the unknown-color hint.
+# All entries are lowercase - commands are lowercased before matching.
 COMMAND_PATTERNS = {
     'on': [
-        r"daddy'?s home",
-        r"turn on",
-        r"lights? on",
-        r"power on"
+        "daddy's home",
+        "daddys home",
+        "turn on",
+        "light on",
+        "lights on",
+        "power on"
     ],
     'off': [
-        r"turn off",
-        r"lights? off",
-        r"power off",
-        r"shut off"
+        "turn off",
+        "light off",
+        "lights off",
+        "power off",
+        "shut off"
     ],
     'color': [
-        r"change to (\w+)",
-        r"set (?:color )?to (\w+)",
-        r"make it (\w+)",
-        r"switch to (\w+)"
+        r"change to",
+        r"set (?:color )?to",
+        r"make it",
+        r"switch to"
     ]
 }
 
+_COLOR_PREFIXES = '|'.join(f'(?:{pattern})' for pattern in COMMAND_PATTERNS['color'])
+COLOR_RE = re.compile(rf'(?:{_COLOR_PREFIXES})\s+(\w+)')
+
+# Every trigger phrase mapped to its intent; color names are their own trigger
+TRIGGERS = {phrase: intent for intent in ('on', 'off') for phrase in COMMAND_PATTERNS[intent]}
+TRIGGERS.update((color, 'color') for color in COLOR_MAP)
+
+# Whole-command fast path: a bare trigger ("turn on", "red") needs no scan
+_LITERAL_INTENTS = {phrase: (intent, phrase) for phrase, intent in TRIGGERS.items()}
+
+# When one utterance holds several triggers, the lowest value wins
+INTENT_PRIORITY = {'on': 0, 'off': 1, 'color': 2}
+
+# Single-pass matcher over all triggers: Aho-Corasick when pyahocorasick is
+# installed, otherwise one named-group alternation regex
+if ahocorasick is not None:
+    _TRIGGER_MATCHER = ahocorasick.Automaton()
+    for _phrase, _intent in TRIGGERS.items():
+        _TRIGGER_MATCHER.add_word(_phrase, (_intent, _phrase))
+    _TRIGGER_MATCHER.make_automaton()
+else:
+    _TRIGGER_MATCHER = re.compile('|'.join(
+        rf"(?P<{intent}>\b(?:{'|'.join(re.escape(p) for p, i in TRIGGERS.items() if i == intent)})\b)"
+        for intent in INTENT_PRIORITY
+    ))
+
+def _is_whole_phrase(command, start, end):
+    """Check a substring hit is not part of a longer word"""
+    return ((start == 0 or not command[start - 1].isalnum()) and
+            (end == len(command) or not command[end].isalnum()))
+
+def _hit_priority(hit):
+    return INTENT_PRIORITY[hit[0]]
+
+def classify_command(command):
+    """Return (intent, phrase) for the highest-priority trigger, or None"""
+    hit = _LITERAL_INTENTS.get(command)
+    if hit:
+        return hit
+    
+    if ahocorasick is not None:
+        hits = (
+            hit for end, hit in _TRIGGER_MATCHER.iter(command)
+            if _is_whole_phrase(command, end + 1 - len(hit[1]), end + 1)
+        )
+    else:
+        hits = ((match.lastgroup, match.group()) for match in _TRIGGER_MATCHER.finditer(command))
+    return min(hits, key=_hit_priority, default=None)
+
 class VoiceRecognitionListener(PythonJavaClass):
     __javainterfaces__ = ['android/speech/RecognitionListener']
     __javacontext__ = 'app'
@@ -127,7 +204,10 @@ class SmartLightControlApp(App):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.ir_manager = None
+        self._ir_transmit = None
         self.recognizer = None
+        self._recog_listener = None
+        self._recog_intent = None
         self.is_listening = False
         self.listening_timeout = None
         self.current_color = "white"
@@ -171,6 +251,10 @@ class SmartLightControlApp(App):
         )
         self.progress_bar.opacity = 0
         
+        # Looping fill animation, interpolated by Kivy while listening
+        self._prog_anim = Animation(value=100, duration=2) + Animation(value=0, duration=0)
+        self._prog_anim.repeat = True
+        
         # Main control button
         self.control_btn = Button(
             text="🎤 Start Listening",
@@ -182,31 +266,45 @@ class SmartLightControlApp(App):
         )
         self.control_btn.bind(on_press=self.toggle_listening)
         
-        # Info panel
+        # Info panel - static command help plus a separate current color line
+        self.info_panel = BoxLayout(orientation='vertical', size_hint=(1, 0.3))
+        
         info_text = (
             "[b]Commands:[/b]\n"
             "• 'Daddy's home' / 'Turn on' - Turn lights on\n"
             "• 'Turn off' - Turn lights off\n"
-            f"• 'Change to [color]' - Available colors: {', '.join(COLOR_MAP.keys())}\n"
-            f"[b]Current color:[/b] {self.current_color}"
+            f"• 'Change to [color]' - Available colors: {_COLOR_LIST_STR}"
         )
         
         self.info_label = Label(
             text=info_text,
             font_size='14sp',
-            size_hint=(1, 0.3),
+            size_hint=(1, 0.8),
             halign='left',
             valign='top',
             text_size=(None, None),
             markup=True
         )
         
+        self.color_label = Label(
+            text=f"[b]Current color:[/b] {self.current_color}",
+            font_size='14sp',
+            size_hint=(1, 0.2),
+            halign='left',
+            valign='top',
+            text_size=(None, None),
+            markup=True
+        )
+        
+        self.info_panel.add_widget(self.info_label)
+        self.info_panel.add_widget(self.color_label)
+        
         # Add widgets to layout
         self.layout.add_widget(title)
         self.layout.add_widget(self.status_label)
         self.layout.add_widget(self.progress_bar)
         self.layout.add_widget(self.control_btn)
-        self.layout.add_widget(self.info_label)
+        self.layout.add_widget(self.info_panel)
         
         return self.layout
 
@@ -219,13 +317,78 @@ class SmartLightControlApp(App):
                     self.show_error("No IR blaster detected on this device")
                     self.control_btn.disabled = True
                 else:
+                    # Bind once so the transmit hot path skips the JNI lookup
+                    self._ir_transmit = self.ir_manager.transmit
                     Logger.info("IR blaster initialized successfully")
             except Exception as e:
                 self.show_error(f"IR initialization failed: {e}")
                 self.control_btn.disabled = True
+            
+            self.warm_up_recognizer()
         else:
             self.show_status("Running in desktop mode - IR features disabled")
 
+    def init_recognizer(self):
+        """Create the speech recognizer and its intent once for reuse across sessions"""
+        self.recognizer = SpeechRecognizer.createSpeechRecognizer(PythonActivity.mActivity)
+        # Keep a reference so the Java-side listener isn't garbage collected
+        self._recog_listener = VoiceRecognitionListener(self.process_speech, self.handle_recognition_error)
+        self.recognizer.setRecognitionListener(self._recog_listener)
+        
+        # Configure recognition intent
+        intent = Intent(RecognizerIntent.ACTION_RECOGNIZE_SPEECH)
+        intent.putExtra(RecognizerIntent.EXTRA_LANGUAGE_MODEL, RecognizerIntent.LANGUAGE_MODEL_FREE_FORM)
+        intent.putExtra(RecognizerIntent.EXTRA_PROMPT, "Speak your light command")
+        intent.putExtra(RecognizerIntent.EXTRA_MAX_RESULTS, 1)
+        intent.putExtra(RecognizerIntent.EXTRA_PARTIAL, True)
+        self._recog_intent = intent
+
+    @run_on_ui_thread
+    def warm_up_recognizer(self):
+        """Create the recognizer ahead of the first listening session"""
+        try:
+            if not self.recognizer:
+                self.init_recognizer()
+        except Exception as e:
+            Logger.error(f"Speech recognizer warm-up failed: {e}")
+
+    @run_on_ui_thread
+    def begin_recognition(self):
+        """Start the recognizer on the Android main thread, off the Kivy thread"""
+        try:
+            # Recognizer is normally warmed up in on_start
+            if not self.recognizer:
+                self.init_recognizer()
+            
+            self.recognizer.startListening(self._recog_intent)
+        except Exception as e:
+            Logger.error(f"Failed to start listening: {e}")
+            Clock.schedule_once(partial(self.recognition_start_failed, e))
+
+    def recognition_start_failed(self, error, dt):
+        """Report a recognizer start failure back on the Kivy thread"""
+        self.show_error(f"Failed to start voice recognition: {error}")
+        self.stop_listening()
+
+    @run_on_ui_thread
+    def cancel_recognition(self):
+        """Cancel the current recognition session on the Android main thread"""
+        try:
+            if self.recognizer:
+                self.recognizer.cancel()
+        except Exception as e:
+            Logger.error(f"Error cancelling recognition: {e}")
+
+    @run_on_ui_thread
+    def destroy_recognizer(self):
+        """Release the recognizer on the Android main thread"""
+        try:
+            if self.recognizer:
+                self.recognizer.destroy()
+                self.recognizer = None
+        except Exception as e:
+            Logger.error(f"Error destroying recognizer: {e}")
+
     def toggle_listening(self, instance):
         """Toggle voice recognition on/off"""
         if self.is_listening:
@@ -247,21 +410,10 @@ class SmartLightControlApp(App):
             
             # Show progress animation
             self.progress_bar.opacity = 1
-            self.animate_progress()
-            
-            # Create speech recognizer
-            self.recognizer = SpeechRecognizer.createSpeechRecognizer(PythonActivity.mActivity)
-            listener = VoiceRecognitionListener(self.process_speech, self.handle_recognition_error)
-            self.recognizer.setRecognitionListener(listener)
+            self._prog_anim.start(self.progress_bar)
             
-            # Configure recognition intent
-            intent = Intent(RecognizerIntent.ACTION_RECOGNIZE_SPEECH)
-            intent.putExtra(RecognizerIntent.EXTRA_LANGUAGE_MODEL, RecognizerIntent.LANGUAGE_MODEL_FREE_FORM)
-            intent.putExtra(RecognizerIntent.EXTRA_PROMPT, "Speak your light command")
-            intent.putExtra(RecognizerIntent.EXTRA_MAX_RESULTS, 5)
-            intent.putExtra(RecognizerIntent.EXTRA_PARTIAL, True)
-            
-            self.recognizer.startListening(intent)
+            # UI already shows listening; the recognizer starts asynchronously
+            self.begin_recognition()
             
             # Set timeout for listening
             self.listening_timeout = Clock.schedule_once(self.listening_timeout_callback, 10)
@@ -274,9 +426,9 @@ class SmartLightControlApp(App):
     def stop_listening(self):
         """Stop voice recognition"""
         try:
-            if self.recognizer:
-                self.recognizer.destroy()
-                self.recognizer = None
+            # The recognizer may still be created on the Android main thread,
+            # so always post the cancel; it checks for the recognizer there
+            self.cancel_recognition()
                 
             if self.listening_timeout:
                 self.listening_timeout.cancel()
@@ -285,43 +437,50 @@ class SmartLightControlApp(App):
             self.is_listening = False
             self.control_btn.text = "🎤 Start Listening"
             self.control_btn.background_color = (0.2, 0.7, 0.3, 1)
+            self._prog_anim.cancel(self.progress_bar)
             self.progress_bar.opacity = 0
+            self.progress_bar.value = 0
             
         except Exception as e:
             Logger.error(f"Error stopping recognition: {e}")
 
+    def _stop_listening_cb(self, dt):
+        """Clock callback for a delayed stop_listening"""
+        self.stop_listening()
+
     def listening_timeout_callback(self, dt):
         """Handle listening timeout"""
         self.show_status("Listening timeout - please try again")
         self.stop_listening()
 
-    def animate_progress(self):
-        """Animate progress bar during listening"""
-        if self.is_listening:
-            self.progress_bar.value = (self.progress_bar.value + 10) % 100
-            Clock.schedule_once(lambda dt: self.animate_progress(), 0.2)
-
+    @mainthread
     def process_speech(self, results):
-        """Process speech recognition results"""
+        """Process speech recognition results on the Kivy thread"""
         try:
             if platform != 'android':
                 return
                 
             matches = results.getStringArrayList(SpeechRecognizer.RESULTS_RECOGNITION)
-            if not matches or matches.size() == 0:
+            match_count = matches.size() if matches is not None else 0
+            if not match_count:
                 self.show_status("No speech detected - please try again")
                 self.stop_listening()
                 return
             
-            # Try all recognition results
-            command_executed = False
-            for i in range(matches.size()):
-                command = matches.get(i).lower().strip()
-                Logger.info(f"Processing command: '{command}'")
-                
-                if self.execute_command(command):
-                    command_executed = True
-                    break
+            # Android ranks hypotheses by confidence - try the top one first
+            command = matches.get(0).lower().strip()
+            Logger.info(f"Processing command: '{command}'")
+            command_executed = self.execute_command(command)
+            
+            # Fall back to the remaining alternatives only if it failed
+            if not command_executed:
+                for i in range(1, match_count):
+                    command = matches.get(i).lower().strip()
+                    Logger.info(f"Processing command: '{command}'")
+                    
+                    if self.execute_command(command):
+                        command_executed = True
+                        break
             
             if not command_executed:
                 self.show_status(f"Command not recognized. Try: 'Turn on', 'Turn off', or 'Change to [color]'")
@@ -330,36 +489,40 @@ class SmartLightControlApp(App):
             Logger.error(f"Error processing speech: {e}")
             self.show_error(f"Speech processing error: {e}")
         finally:
-            Clock.schedule_once(lambda dt: self.stop_listening(), 1)
+            Clock.schedule_once(self._stop_listening_cb, 1)
 
     def execute_command(self, command):
         """Execute voice command"""
         try:
-            # Check for ON commands
-            for pattern in COMMAND_PATTERNS['on']:
-                if re.search(pattern, command, re.IGNORECASE):
-                    self.send_ir_code([38000, 9000, 4500, 562, 562, 562, 562], "Turning lights ON")
-                    return True
+            # Patterns are lowercase; a no-op for already-normalized input
+            command = command.lower()
             
-            # Check for OFF commands  
-            for pattern in COMMAND_PATTERNS['off']:
-                if re.search(pattern, command, re.IGNORECASE):
-                    self.send_ir_code([38000, 9000, 4500, 562, 1687, 1687, 562], "Turning lights OFF")
+            hit = classify_command(command)
+            if hit:
+                intent, phrase = hit
+                
+                # Check for ON commands
+                if intent == 'on':
+                    self.send_ir_code('on', "Turning lights ON")
+                    return True
+                
+                # Check for OFF commands
+                if intent == 'off':
+                    self.send_ir_code('off', "Turning lights OFF")
                     return True
+                
+                # Color command - the matched phrase is the color name
+                self.current_color = phrase
+                self.update_info_panel()
+                self.send_ir_code(phrase, f"Changing to {phrase.upper()}")
+                return True
             
-            # Check for color commands
-            for pattern in COMMAND_PATTERNS['color']:
-                match = re.search(pattern, command, re.IGNORECASE)
-                if match:
-                    color = match.group(1).lower()
-                    if color in COLOR_MAP:
-                        self.current_color = color
-                        self.update_info_panel()
-                        self.send_ir_code(COLOR_MAP[color], f"Changing to {color.upper()}")
-                        return True
-                    else:
-                        self.show_status(f"Color '{color}' not available. Try: {', '.join(COLOR_MAP.keys())}")
-                        return False
+            # Color phrasing with an unknown color word
+            match = COLOR_RE.search(command)
+            if match:
+                color = match.group(1)
+                self.show_status(f"Color '{color}' not available. Try: {_COLOR_LIST_STR}")
+                return False
             
             return False
             
@@ -368,27 +531,22 @@ class SmartLightControlApp(App):
             self.show_error(f"Command execution error: {e}")
             return False
 
-    def send_ir_code(self, pattern, action_text):
+    def send_ir_code(self, code_name, action_text):
         """Send IR code with improved error handling"""
         try:
             if platform != 'android':
                 self.show_status(f"[Desktop Mode] {action_text}")
                 return
                 
-            if not self.ir_manager:
+            # Only bound by on_start when an IR emitter was found
+            if not self._ir_transmit:
                 self.show_error("IR manager not available")
                 return
-                
-            if not self.ir_manager.hasIrEmitter():
-                self.show_error("No IR emitter found")
-                return
             
-            # Convert pattern to proper format
-            frequency = pattern[0]
-            signal_pattern = pattern[1:]
+            frequency, signal_pattern = _IR_BURSTS[code_name]
             
             # Transmit IR signal
-            self.ir_manager.transmit(frequency, signal_pattern)
+            self._ir_transmit(frequency, signal_pattern)
             self.show_success(f"✅ {action_text}")
             
             Logger.info(f"IR signal sent: {action_text}")
@@ -397,42 +555,39 @@ class SmartLightControlApp(App):
             Logger.error(f"IR transmission error: {e}")
             self.show_error(f"Failed to send IR signal: {e}")
 
+    @mainthread
     def handle_recognition_error(self, error_message):
-        """Handle voice recognition errors"""
+        """Handle voice recognition errors on the Kivy thread"""
         self.show_error(f"Voice recognition error: {error_message}")
-        Clock.schedule_once(lambda dt: self.stop_listening(), 1)
+        Clock.schedule_once(self._stop_listening_cb, 1)
+
+    def _set_status(self, text, color):
+        """Update status label text and color together"""
+        label = self.status_label
+        label.text, label.color = text, color
 
     def show_status(self, message):
         """Show status message"""
-        self.status_label.text = message
-        self.status_label.color = (1, 1, 1, 1)  # White
+        self._set_status(message, (1, 1, 1, 1))  # White
 
     def show_success(self, message):
         """Show success message"""
-        self.status_label.text = message
-        self.status_label.color = (0.2, 0.8, 0.2, 1)  # Green
+        self._set_status(message, (0.2, 0.8, 0.2, 1))  # Green
 
     def show_error(self, message):
         """Show error message"""
-        self.status_label.text = f"❌ {message}"
-        self.status_label.color = (0.9, 0.2, 0.2, 1)  # Red
+        self._set_status(f"❌ {message}", (0.9, 0.2, 0.2, 1))  # Red
         Logger.error(message)
 
     def update_info_panel(self):
         """Update the info panel with current settings"""
-        info_text = (
-            "[b]Commands:[/b]\n"
-            "• 'Daddy's home' / 'Turn on' - Turn lights on\n"
-            "• 'Turn off' - Turn lights off\n"
-            f"• 'Change to [color]' - Available colors: {', '.join(COLOR_MAP.keys())}\n"
-            f"[b]Current color:[/b] {self.current_color}"
-        )
-        self.info_label.text = info_text
+        self.color_label.text = f"[b]Current color:[/b] {self.current_color}"
 
     def on_stop(self):
         """Clean up when app closes"""
         try:
             self.stop_listening()
+            self.destroy_recognizer()
         except:
             pass
 